@@ -38,14 +38,17 @@ class AsyncTask(ABC):
         """Asynchronous task. Must be overriden by subclasses."""
         raise NotImplementedError
 
-    def run(self, loop: AbstractEventLoop) -> None:
+    def run(self, loop: AbstractEventLoop) -> asyncio.Task[None]:
         """Runs the asynchronous task.
 
         Args:
             loop: The event loop on which to schedule the task.
+
+        Returns:
+            The scheduled task.
         """
         self.logger.info("%s task running", self.purpose)
-        loop.create_task(self.task(), name=self.purpose)
+        return loop.create_task(self.task(), name=self.purpose)
 
 
 class MessageConsumer(AsyncTask, Generic[MT]):
@@ -47,18 +47,21 @@ class OPCUAClient(AsyncTask):
             frontend_messaging_writer: Frontend messaging task instance.
         """
         self._config = config
+        # Parsed once, the client is created again on each connection retry
+        server_url = URL(config.server_url)
+        self._server_url = str(server_url.with_user(None))
+        self._server_user = server_url.user
+        self._server_password = server_url.password
         self._centrifugo_proxy_server = centrifugo_proxy_server
         self._frontend_messaging_writer = frontend_messaging_writer
         self._influx_writer = influx_writer
         self._status = LinkStatus.Down
 
     async def _create_opc_client(self) -> asyncua.Client:
-        server_url = URL(self._config.server_url)
-        sanitized_server_url = server_url.with_user(None)
-        client = asyncua.Client(url=str(sanitized_server_url))
-        if server_url.user is not None:
-            client.set_user(server_url.user)
-            client.set_password(server_url.password)
+        client = asyncua.Client(url=self._server_url)
+        if self._server_user is not None:
+            client.set_user(self._server_user)
+            client.set_password(self._server_password)
         if self._config.cert_file is not None:
             await client.set_security(
                 SecurityPolicyBasic256Sha256,
@@ -69,10 +72,20 @@ class OPCUAClient(AsyncTask):
 
     async def _subscribe(self, client: asyncua.Client, ns_index: int) -> None:
         subscription = await client.create_subscription(1000, self)
-        for node_id in self._config.monitor_nodes:
-            node = client.get_node(ua.NodeId(node_id, ns_index))
+        nodes = [
+            client.get_node(ua.NodeId(node_id, ns_index))
+            for node_id in self._config.monitor_nodes
+        ]
+        if not nodes:
+            # Servers answer an empty item list with Bad_NothingToDo
+            return
+        # Subscribing to a list of nodes returns a status code for each failure
+        results = await subscription.subscribe_data_change(nodes)
+        for node_id, result in zip(self._config.monitor_nodes, results):
+            if not isinstance(result, ua.StatusCode):
+                continue
             try:
-                await subscription.subscribe_data_change(node)
+                result.check()
             except UaStatusCodeError:
                 _logger.exception("Error subscribing to node %s", node_id)
                 raise
@@ -7,6 +7,7 @@ from _pytest.main import Session
 from _pytest.nodes import Item
 
 INTEGRATION_MARKER = "integration"
+UNIT_MARKER = "unit"
 
 MANDATORY_ENV_ARGS = {
     "CENTRIFUGO_API_KEY": "key",
@@ -33,6 +34,7 @@ def pytest_configure(config: Config) -> None:
     config.addinivalue_line(
         "markers", f"{INTEGRATION_MARKER}: mark the test as an integration test"
     )
+    config.addinivalue_line("markers", f"{UNIT_MARKER}: mark the test as a unit test")
 
 
 def pytest_collection_modifyitems(
@@ -44,11 +46,13 @@ def pytest_collection_modifyitems(
         rel_path = Path(item.fspath).relative_to(config.rootpath / "tests")
         if rel_path.parts[0] == "integration":
             item.add_marker(INTEGRATION_MARKER)
+        elif rel_path.parts[0] == "unit":
+            item.add_marker(UNIT_MARKER)
 
     items.sort(key=_sorting_key)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mandatory_env_args() -> dict[str, str]:
     return MANDATORY_ENV_ARGS
 
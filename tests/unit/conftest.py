@@ -1,7 +1,104 @@
+import asyncio
+import contextlib
+import logging
+from typing import Any, AsyncIterator, Callable, Iterator
+
 import pytest
+from aiohttp import ClientResponse, ClientSession
 from pytest_httpserver import HeaderValueMatcher
+from pytest_mock import MockerFixture
+
+LogRecordsType = Callable[[], list[logging.LogRecord]]
+CaptureLoggerType = Callable[[logging.Logger], LogRecordsType]
+LingeringTasksType = Callable[[], set[asyncio.Task[Any]]]
+
+
+class RecordListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Tests look at the formatted message, as with caplog records
+        record.message = record.getMessage()
+        self.records.append(record)
+
+
+@pytest.fixture(scope="session")
+def session_event_loop() -> Iterator[asyncio.AbstractEventLoop]:
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def event_loop(
+    session_event_loop: asyncio.AbstractEventLoop,
+) -> asyncio.AbstractEventLoop:
+    return session_event_loop
+
+
+@pytest.fixture
+def lingering_tasks() -> LingeringTasksType:
+    # Overridden where a wider-scoped fixture owns long-lived tasks
+    return lambda: set()
+
+
+@pytest.fixture(autouse=True)
+def no_leaked_tasks(
+    lingering_tasks: LingeringTasksType,
+    session_event_loop: asyncio.AbstractEventLoop,
+) -> Iterator[None]:
+    yield
+    # Let cancelled tasks unwind before looking for leftovers
+    session_event_loop.run_until_complete(asyncio.sleep(0))
+    assert not asyncio.all_tasks(session_event_loop) - lingering_tasks()
 
 
 @pytest.fixture(scope="session", autouse=True)
 def authorization_matcher() -> None:
-    del HeaderValueMatcher.DEFAULT_MATCHERS["Authorization"]
+    HeaderValueMatcher.DEFAULT_MATCHERS.pop("Authorization", None)
+
+
+@pytest.fixture(scope="session")
+def httpserver_listen_address() -> tuple[str, int]:
+    # Numeric address spares a name resolution on each client connection
+    return ("127.0.0.1", 0)
+
+
+@pytest.fixture
+def capture_logger() -> Iterator[CaptureLoggerType]:
+    installed: list[tuple[logging.Logger, RecordListHandler, int]] = []
+
+    def _inner(logger: logging.Logger) -> LogRecordsType:
+        handler = RecordListHandler()
+        installed.append((logger, handler, logger.level))
+        logger.addHandler(handler)
+        # Records of every level, whatever the root logger level
+        logger.setLevel(logging.DEBUG)
+        return lambda: handler.records
+
+    yield _inner
+    for logger, handler, level in installed:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+
+@pytest.fixture
+def post_handled(mocker: MockerFixture) -> asyncio.Event:
+    # Set once a real ClientSession.post request has been handled
+    handled = asyncio.Event()
+    real_post = ClientSession.post
+
+    @contextlib.asynccontextmanager
+    async def _post(
+        session: ClientSession, *args: Any, **kwargs: Any
+    ) -> AsyncIterator[ClientResponse]:
+        try:
+            async with real_post(session, *args, **kwargs) as resp:
+                yield resp
+        finally:
+            handled.set()
+
+    mocker.patch.object(ClientSession, "post", _post)
+    return handled
@@ -1,51 +1,96 @@
 import asyncio
 import contextlib
-from typing import Any, Awaitable, Callable, cast
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, cast
 from unittest.mock import Mock as MockType
 
 import aiohttp
 import pytest
-from aiohttp import web
-from aiohttp.client_exceptions import ClientConnectorError
-from aiohttp.pytest_plugin import AiohttpClient
-from aiohttp.test_utils import RawTestServer, unused_port
-from aiohttp.typedefs import Handler
+from aiohttp import TCPConnector, web
+from aiohttp.test_utils import RawTestServer, TestClient, unused_port
+from pytest import MonkeyPatch
 from pytest_mock import MockerFixture
 
 from opcua_webhmi_bridge.frontend_messaging import CentrifugoProxyServer
-from opcua_webhmi_bridge.messages import MessageType
+from opcua_webhmi_bridge.messages import LinkStatus, MessageType, OPCStatusMessage
 
-RawServerFixture = Callable[[Handler], Awaitable[RawTestServer]]
+from .conftest import LingeringTasksType
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def server_port() -> int:
     return unused_port()
 
 
+@pytest.fixture(scope="module")
+def shared_proxy_server(
+    module_mocker: MockerFixture, server_port: int
+) -> CentrifugoProxyServer:
+    config = module_mocker.Mock(proxy_host="127.0.0.1", proxy_port=server_port)
+    return CentrifugoProxyServer(config, module_mocker.Mock())
+
+
 @pytest.fixture
-def proxy_server(mocker: MockerFixture, server_port: int) -> CentrifugoProxyServer:
-    config = mocker.Mock(proxy_host="127.0.0.1", proxy_port=server_port)
-    return CentrifugoProxyServer(config, mocker.Mock())
+def new_proxy_server(mocker: MockerFixture) -> CentrifugoProxyServer:
+    # Not reset by a fixture, for the tests of the initial state
+    return CentrifugoProxyServer(mocker.Mock(), mocker.Mock())
 
 
-def test_opc_status_init(proxy_server: CentrifugoProxyServer) -> None:
-    assert str(proxy_server.last_opc_status.payload) == "LinkStatus.Down"
+@pytest.fixture
+def proxy_server(shared_proxy_server: CentrifugoProxyServer) -> CentrifugoProxyServer:
+    shared_proxy_server.clear_last_opc_data()
+    shared_proxy_server.last_opc_status = OPCStatusMessage(LinkStatus.Down)
+    cast(MockType, shared_proxy_server._messaging_writer).reset_mock()
+    return shared_proxy_server
 
 
-def test_last_opc_data(
-    mocker: MockerFixture,
-    proxy_server: CentrifugoProxyServer,
-) -> None:
-    assert proxy_server._last_opc_data == {}
-    message = mocker.Mock(node_id="test_id")
-    proxy_server.record_last_opc_data(message)
-    assert proxy_server._last_opc_data == {"test_id": message}
-    proxy_server.clear_last_opc_data()
-    assert proxy_server._last_opc_data == {}
+@dataclass(slots=True)
+class FakeMsg:
+    node_id: str
+
+
+@pytest.fixture(scope="module")
+def opc_messages() -> list[Any]:
+    return [FakeMsg(str(i)) for i in range(5)]
+
+
+def test_opc_status_init(new_proxy_server: CentrifugoProxyServer) -> None:
+    assert str(new_proxy_server.last_opc_status.payload) == "LinkStatus.Down"
+
+
+def test_last_opc_data(new_proxy_server: CentrifugoProxyServer) -> None:
+    assert new_proxy_server._last_opc_data == {}
+    message: Any = FakeMsg("test_id")
+    new_proxy_server.record_last_opc_data(message)
+    assert new_proxy_server._last_opc_data == {"test_id": message}
+    new_proxy_server.clear_last_opc_data()
+    assert new_proxy_server._last_opc_data == {}
 
 
 class TestCentrifugoSubscribe:
+    @pytest.fixture(scope="class")
+    async def shared_client(
+        self, shared_proxy_server: CentrifugoProxyServer
+    ) -> AsyncIterator[TestClient]:
+        server = RawTestServer(
+            shared_proxy_server.centrifugo_subscribe  # type: ignore[arg-type]
+        )
+        connector = TCPConnector(limit=1, force_close=False)
+        async with TestClient(server, connector=connector) as client:
+            yield client
+
+    @pytest.fixture
+    def lingering_tasks(self, shared_client: TestClient) -> LingeringTasksType:
+        # The server handles each keep-alive connection in a task of its own
+        def _inner() -> set[asyncio.Task[Any]]:
+            return {
+                conn._task_handler
+                for conn in shared_client.server.handler.connections
+                if conn._task_handler is not None
+            }
+
+        return _inner
+
     @pytest.mark.parametrize(
         ["json", "exp_status", "exp_reason"],
         [
@@ -61,16 +106,12 @@ class TestCentrifugoSubscribe:
     )
     async def test_http_error(
         self,
-        aiohttp_client: AiohttpClient,
-        aiohttp_raw_server: RawServerFixture,
         exp_status: int,
         exp_reason: str,
         json: Any,
-        proxy_server: CentrifugoProxyServer,
+        shared_client: TestClient,
     ) -> None:
-        server = await aiohttp_raw_server(proxy_server.centrifugo_subscribe)
-        client = await aiohttp_client(server)
-        response = await client.post("/", json=json)
+        response = await shared_client.post("/", json=json)
         assert response.status == exp_status
         assert response.reason == exp_reason
 
@@ -87,67 +128,68 @@ class TestCentrifugoSubscribe:
     )
     async def test_centrifugo_error(
         self,
-        aiohttp_client: AiohttpClient,
-        aiohttp_raw_server: RawServerFixture,
         expected_error: dict[str, Any],
         json: dict[str, Any],
-        proxy_server: CentrifugoProxyServer,
+        shared_client: TestClient,
     ) -> None:
-        server = await aiohttp_raw_server(proxy_server.centrifugo_subscribe)
-        client = await aiohttp_client(server)
-        response = await client.post("/", json=json)
+        response = await shared_client.post("/", json=json)
         assert response.status == 200
         response_json = await response.json()
         assert response_json["error"] == expected_error
 
     async def test_opc_data(
         self,
-        aiohttp_client: AiohttpClient,
-        aiohttp_raw_server: RawServerFixture,
-        mocker: MockerFixture,
+        monkeypatch: MonkeyPatch,
+        opc_messages: list[Any],
         proxy_server: CentrifugoProxyServer,
+        shared_client: TestClient,
     ) -> None:
-        messages = [mocker.Mock(f"message_{i}") for i in range(5)]
+        captured: list[Any] = []
+        monkeypatch.setattr(proxy_server._messaging_writer, "put", captured.append)
         proxy_server._last_opc_data = {
-            str(index): value for index, value in enumerate(messages)
+            str(index): value for index, value in enumerate(opc_messages)
         }
-        server = await aiohttp_raw_server(proxy_server.centrifugo_subscribe)
-        client = await aiohttp_client(server)
-        await client.post("/", json={"channel": "proxied:opc_data"})
-        put = cast(MockType, proxy_server._messaging_writer.put)
-        expected_calls = [((m,),) for m in messages]
-        assert put.call_args_list == expected_calls
+        await shared_client.post("/", json={"channel": "proxied:opc_data"})
+        assert captured == opc_messages
 
     async def test_opc_status(
         self,
-        aiohttp_client: AiohttpClient,
-        aiohttp_raw_server: RawServerFixture,
         mocker: MockerFixture,
         proxy_server: CentrifugoProxyServer,
+        shared_client: TestClient,
     ) -> None:
         status_message = mocker.Mock()
         proxy_server.last_opc_status = status_message
-        server = await aiohttp_raw_server(proxy_server.centrifugo_subscribe)
-        client = await aiohttp_client(server)
-        await client.post("/", json={"channel": "proxied:opc_status"})
+        await shared_client.post("/", json={"channel": "proxied:opc_status"})
         put = cast(MockType, proxy_server._messaging_writer.put)
         put.assert_called_once_with(status_message)
 
     @pytest.mark.parametrize("message_type", MessageType)
     async def test_known_channel(
         self,
-        aiohttp_client: AiohttpClient,
-        aiohttp_raw_server: RawServerFixture,
         message_type: MessageType,
-        proxy_server: CentrifugoProxyServer,
+        shared_client: TestClient,
     ) -> None:
-        server = await aiohttp_raw_server(proxy_server.centrifugo_subscribe)
-        client = await aiohttp_client(server)
-        response = await client.post("/", json={"channel": message_type.value})
+        response = await shared_client.post("/", json={"channel": message_type.value})
         assert response.status == 200
         assert await response.json() == {"result": {}}
 
 
+async def _wait_port(port: int, timeout: float = 2.0) -> None:
+    async def _probe() -> None:
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                await asyncio.sleep(0.005)
+            else:
+                writer.close()
+                await writer.wait_closed()
+                return
+
+    await asyncio.wait_for(_probe(), timeout)
+
+
 @pytest.mark.asyncio
 async def test_task(
     event_loop: asyncio.AbstractEventLoop,
@@ -162,21 +204,15 @@ async def test_task(
 
     task = event_loop.create_task(proxy_server.task())
 
-    reached = False
-
-    while not reached:
-        try:
-            async with aiohttp.request(
-                "POST",
-                f"http://127.0.0.1:{server_port}/centrifugo/subscribe",
-                data="Request text",
-            ) as resp:
-                assert resp.status == 200
-                assert await resp.text() == "Request text"
-        except ClientConnectorError:
-            await asyncio.sleep(0.1)
-        else:
-            reached = True
+    await _wait_port(server_port)
+
+    async with aiohttp.request(
+        "POST",
+        f"http://127.0.0.1:{server_port}/centrifugo/subscribe",
+        data="Request text",
+    ) as resp:
+        assert resp.status == 200
+        assert await resp.text() == "Request text"
 
     task.cancel()
     with contextlib.suppress(asyncio.CancelledError):
@@ -1,6 +1,7 @@
+import os
 import re
 from pathlib import Path
-from typing import Callable, Iterable, NamedTuple
+from typing import Iterator, NamedTuple
 
 import pytest
 from pytest import MonkeyPatch
@@ -13,44 +14,44 @@ class EnvArg(NamedTuple):
     value: str
 
 
-SetVarsFixture = Callable[[Iterable[EnvArg]], None]
+ENV_VAR_PATTERNS = {
+    env_var: re.compile(re.escape(env_var)) for env_var, _ in Settings.help()
+}
 
 
 def arg_name(arg: EnvArg) -> str:
     return arg.name
 
 
-@pytest.fixture
-def mandatory_env_args(mandatory_env_args: dict[str, str]) -> list[EnvArg]:
-    return [EnvArg(key, value) for key, value in mandatory_env_args.items()]
+@pytest.fixture(scope="session")
+def mandatory_env_args(mandatory_env_args: dict[str, str]) -> tuple[EnvArg, ...]:
+    return tuple(EnvArg(key, value) for key, value in mandatory_env_args.items())
 
 
-@pytest.fixture
-def set_vars(monkeypatch: MonkeyPatch) -> SetVarsFixture:
-    def inner(vars: Iterable[EnvArg]) -> None:
-        for v in vars:
-            monkeypatch.setenv(v.name, v.value)
+@pytest.fixture(autouse=True)
+def environ(mandatory_env_args: tuple[EnvArg, ...]) -> Iterator[None]:
+    # Being autouse, this fixture is finalized after `monkeypatch`,
+    # so it also catches variables that monkeypatch restored.
+    saved = os.environ.copy()
+    os.environ.update(mandatory_env_args)
+    yield
+    for name in os.environ.keys() - saved.keys():
+        del os.environ[name]
+    os.environ.update(
+        {name: value for name, value in saved.items() if os.environ.get(name) != value}
+    )
 
-    return inner
 
-
-def test_all_mandatory_args(
-    mandatory_env_args: list[EnvArg],
-    set_vars: SetVarsFixture,
-) -> None:
-    set_vars(mandatory_env_args)
+def test_all_mandatory_args() -> None:
     assert Settings() is not None
 
 
 def test_missing_mandatory_arg(
-    mandatory_env_args: list[EnvArg],
     mandatory_env_args_keys: str,
     monkeypatch: MonkeyPatch,
-    set_vars: SetVarsFixture,
 ) -> None:
-    set_vars(mandatory_env_args)
     monkeypatch.delenv(mandatory_env_args_keys)
-    with pytest.raises(ConfigError, match=re.escape(mandatory_env_args_keys)):
+    with pytest.raises(ConfigError, match=ENV_VAR_PATTERNS[mandatory_env_args_keys]):
         Settings()
 
 
@@ -77,14 +78,11 @@ def test_missing_mandatory_arg(
     ids=arg_name,
 )
 def test_bad_arg_type(
-    mandatory_env_args: list[EnvArg],
     monkeypatch: MonkeyPatch,
-    set_vars: SetVarsFixture,
     bad_arg: EnvArg,
 ) -> None:
-    set_vars(mandatory_env_args)
     monkeypatch.setenv(bad_arg.name, bad_arg.value)
-    with pytest.raises(ConfigError, match=re.escape(bad_arg.name)):
+    with pytest.raises(ConfigError, match=ENV_VAR_PATTERNS[bad_arg.name]):
         Settings()
 
 
@@ -104,12 +102,9 @@ def test_bad_arg_type(
 def test_opc_cert_and_key(
     apply_args: list[str],
     expect_failure: bool,
-    mandatory_env_args: list[EnvArg],
     monkeypatch: MonkeyPatch,
-    set_vars: SetVarsFixture,
     tmp_path: Path,
 ) -> None:
-    set_vars(mandatory_env_args)
     for arg in apply_args:
         file = tmp_path / arg.lower()
         file.touch()
@@ -123,8 +118,7 @@ def test_opc_cert_and_key(
         Settings()
 
 
-def test_help(mandatory_env_args: list[EnvArg], set_vars: SetVarsFixture) -> None:
-    set_vars(mandatory_env_args)
+def test_help(mandatory_env_args: tuple[EnvArg, ...]) -> None:
     mandatory_names = [n for n, _ in mandatory_env_args]
     for env_var, help_text in Settings.help():
         assert (env_var in mandatory_names) != ("default:" in help_text)
@@ -1,43 +1,100 @@
 import asyncio
 import contextlib
 import logging
-from dataclasses import dataclass
-from typing import Any, Callable
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, cast
 
 import pytest
-from pytest import LogCaptureFixture
+from aiohttp import ClientResponseError, ClientSession, RequestInfo
+from multidict import CIMultiDict, CIMultiDictProxy
 from pytest_httpserver import HTTPServer
 from pytest_mock import MockerFixture
+from yarl import URL
 
+from opcua_webhmi_bridge.config import CentrifugoSettings
 from opcua_webhmi_bridge.frontend_messaging import FrontendMessagingWriter
 
-LogRecordsType = Callable[[], list[logging.LogRecord]]
+from .conftest import CaptureLoggerType, LogRecordsType
 
+API_URL = "http://centrifugo.test/api"
 
-@pytest.fixture
-def log_records(caplog: LogCaptureFixture) -> LogRecordsType:
-    def _inner() -> list[logging.LogRecord]:
-        return list(
-            filter(
-                lambda r: r.name == FrontendMessagingWriter.logger.name,
-                caplog.records,
+
+@dataclass(frozen=True, slots=True)
+class FakeSecret:
+    value: str
+
+    def get_secret_value(self) -> str:
+        return self.value
+
+
+@dataclass(frozen=True, slots=True)
+class FakeConfig:
+    api_url: str
+    api_key: FakeSecret
+
+
+@dataclass
+class FakeResponse:
+    status: int = 200
+    json_data: dict[str, Any] = field(default_factory=dict)
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            request_info = RequestInfo(
+                URL(API_URL), "POST", CIMultiDictProxy(CIMultiDict())
+            )
+            raise ClientResponseError(
+                request_info, (), status=self.status, message="Client error"
             )
-        )
 
-    return _inner
+    async def json(self) -> dict[str, Any]:
+        return self.json_data
+
+
+class FakePost:
+    """Stands for `ClientSession.post`, recording requests without any I/O."""
+
+    def __init__(self, response: FakeResponse) -> None:
+        self.response = response
+        self.requests: list[tuple[str, Any]] = []
+        self.handled = asyncio.Event()
+
+    @contextlib.asynccontextmanager
+    async def __call__(self, url: str, *, json: Any) -> AsyncIterator[FakeResponse]:
+        self.requests.append((url, json))
+        try:
+            yield self.response
+        finally:
+            self.handled.set()
+
+
+FakePostFixture = Callable[[FakeResponse], FakePost]
 
 
 @pytest.fixture
-def messaging_writer(
-    httpserver: HTTPServer,
-    mocker: MockerFixture,
-) -> FrontendMessagingWriter:
-    mocker.patch("opcua_webhmi_bridge.frontend_messaging.HEARTBEAT_TIMEOUT", 0.5)
-    config = mocker.Mock(
-        api_url=httpserver.url_for("/api"),
-        **{"api_key.get_secret_value.return_value": "api_key"}
-    )
-    return FrontendMessagingWriter(config)
+def log_records(capture_logger: CaptureLoggerType) -> LogRecordsType:
+    return capture_logger(FrontendMessagingWriter.logger)
+
+
+@pytest.fixture
+def api_url() -> str:
+    return API_URL
+
+
+@pytest.fixture
+def messaging_writer(api_url: str) -> FrontendMessagingWriter:
+    config = FakeConfig(api_url=api_url, api_key=FakeSecret("api_key"))
+    return FrontendMessagingWriter(cast(CentrifugoSettings, config))
+
+
+@pytest.fixture
+def fake_post(mocker: MockerFixture) -> FakePostFixture:
+    def _inner(response: FakeResponse) -> FakePost:
+        fake = FakePost(response)
+        mocker.patch.object(ClientSession, "post", fake)
+        return fake
+
+    return _inner
 
 
 @pytest.fixture
@@ -85,31 +142,36 @@ class TestTask:
         self,
         event_loop: asyncio.AbstractEventLoop,
         fake_message: Any,
-        httpserver: HTTPServer,
+        fake_post: FakePostFixture,
         log_records: LogRecordsType,
         messaging_writer: FrontendMessagingWriter,
+        mocker: MockerFixture,
         testcase: RequestSuccesTestCase,
     ) -> None:
-        httpserver.expect_oneshot_request(
-            "/api",
-            method="POST",
-            headers={"Authorization": "apikey api_key"},
-            json={
-                "method": "publish",
-                "params": {
-                    "channel": testcase.expected_msg_type,
-                    "data": {
-                        "payload": testcase.expected_payload,
-                    },
-                },
-            },
-        ).respond_with_json({})
+        if testcase.timeout:
+            # Other cases keep the real timeout, so no heartbeat slips in
+            mocker.patch(
+                "opcua_webhmi_bridge.frontend_messaging.HEARTBEAT_TIMEOUT", 0.01
+            )
+        post = fake_post(FakeResponse())
         task = event_loop.create_task(messaging_writer.task())
         if not testcase.timeout:
             messaging_writer.put(fake_message)
-        await asyncio.sleep(0.6 if testcase.timeout else 0.1)
-        assert len(httpserver.log) > 0
-        httpserver.check_assertions()  # type: ignore
+        await asyncio.wait_for(post.handled.wait(), timeout=1.0)
+        assert post.requests == [
+            (
+                API_URL,
+                {
+                    "method": "publish",
+                    "params": {
+                        "channel": testcase.expected_msg_type,
+                        "data": {
+                            "payload": testcase.expected_payload,
+                        },
+                    },
+                },
+            )
+        ]
         assert not any(r.levelno == logging.ERROR for r in log_records())
         task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
@@ -134,23 +196,59 @@ class TestTask:
         self,
         event_loop: asyncio.AbstractEventLoop,
         fake_message: Any,
-        httpserver: HTTPServer,
+        fake_post: FakePostFixture,
         log_records: LogRecordsType,
         messaging_writer: FrontendMessagingWriter,
         testcase: RequestFailureTestCase,
+    ) -> None:
+        post = fake_post(FakeResponse(testcase.response_status, testcase.response_json))
+        task = event_loop.create_task(messaging_writer.task())
+        messaging_writer.put(fake_message)
+        await asyncio.wait_for(post.handled.wait(), timeout=1.0)
+        assert len(post.requests) > 0
+        last_log_record = log_records()[-1]
+        assert last_log_record.levelno == logging.ERROR
+        assert testcase.logged_error_contains in last_log_record.message
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+@pytest.mark.asyncio
+class TestTaskEndToEnd:
+    @pytest.fixture
+    def api_url(self, httpserver: HTTPServer) -> str:
+        return str(httpserver.url_for("/api"))
+
+    async def test_http_request(
+        self,
+        event_loop: asyncio.AbstractEventLoop,
+        fake_message: Any,
+        httpserver: HTTPServer,
+        log_records: LogRecordsType,
+        messaging_writer: FrontendMessagingWriter,
+        post_handled: asyncio.Event,
     ) -> None:
         httpserver.expect_oneshot_request(
             "/api",
+            method="POST",
             headers={"Authorization": "apikey api_key"},
-        ).respond_with_json(testcase.response_json, status=testcase.response_status)
+            json={
+                "method": "publish",
+                "params": {
+                    "channel": "test_channel",
+                    "data": {
+                        "payload": "test_payload",
+                    },
+                },
+            },
+        ).respond_with_json({})
         task = event_loop.create_task(messaging_writer.task())
         messaging_writer.put(fake_message)
-        await asyncio.sleep(0.1)
+        await asyncio.wait_for(post_handled.wait(), timeout=1.0)
         assert len(httpserver.log) > 0
         httpserver.check_assertions()  # type: ignore
-        last_log_record = log_records()[-1]
-        assert last_log_record.levelno == logging.ERROR
-        assert testcase.logged_error_contains in last_log_record.message
+        assert not any(r.levelno == logging.ERROR for r in log_records())
         task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
             await task
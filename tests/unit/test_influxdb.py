@@ -1,48 +1,109 @@
 import asyncio
 import contextlib
 import logging
-from typing import Any, Callable
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, cast
 
 import pytest
-from pytest import LogCaptureFixture
-from pytest_httpserver import HTTPServer
+from aiohttp import web
+from aiohttp.test_utils import RawTestServer, unused_port
 from pytest_mock import MockerFixture
 
+from opcua_webhmi_bridge.config import InfluxSettings
 from opcua_webhmi_bridge.influxdb import (
     InfluxDBWriter,
     UnexpextedScalarError,
     flatten,
     to_influx,
 )
+from opcua_webhmi_bridge.library import QUEUE_MAXSIZE
 
-LogRecordsType = Callable[[], list[logging.LogRecord]]
+from .conftest import CaptureLoggerType, LogRecordsType
 
+DICT_PAYLOAD = {"field1": 1, "field2": "value 2", "field3": 1.0, "field4": False}
+DICT_EXPECTED = 'dict.node field1=1i,field2="value 2",field3=1.0,field4=False '
 
-@pytest.fixture
-def log_records(caplog: LogCaptureFixture) -> LogRecordsType:
-    def _inner() -> list[logging.LogRecord]:
-        return list(
-            filter(
-                lambda r: r.name == InfluxDBWriter.logger.name,
-                caplog.records,
+
+@dataclass(frozen=True, slots=True)
+class FakeConfig:
+    org: str
+    bucket: str
+    write_token: str
+    base_url: str
+
+
+@dataclass
+class RecordedRequest:
+    method: str
+    path: str
+    query: dict[str, str]
+    authorization: str | None
+    body: str
+
+
+@dataclass
+class FakeInfluxDB:
+    status: int = 204
+    json_data: dict[str, Any] | None = None
+    requests: list[RecordedRequest] = field(default_factory=list)
+
+    async def handler(self, request: web.BaseRequest) -> web.StreamResponse:
+        self.requests.append(
+            RecordedRequest(
+                request.method,
+                request.path,
+                dict(request.query),
+                request.headers.get("Authorization"),
+                await request.text(),
             )
         )
+        if self.json_data is None:
+            return web.Response(status=self.status)
+        return web.json_response(self.json_data, status=self.status)
+
 
-    return _inner
+EXPECTED_REQUEST = RecordedRequest(
+    method="POST",
+    path="/influx/api/v2/write",
+    query={"org": "test_org", "bucket": "test_bucket", "precision": "s"},
+    authorization="Token test_token",
+    body="measurement,tag=tagval field=1.0 ",
+)
 
 
 @pytest.fixture
-def influxdb_writer(
-    httpserver: HTTPServer,
-    mocker: MockerFixture,
-) -> InfluxDBWriter:
-    config = mocker.Mock(  # noqa: S106
+def log_records(capture_logger: CaptureLoggerType) -> LogRecordsType:
+    return capture_logger(InfluxDBWriter.logger)
+
+
+@pytest.fixture(scope="module")
+def influxdb_port() -> int:
+    return unused_port()
+
+
+@pytest.fixture(scope="module")
+def influxdb_config(influxdb_port: int) -> InfluxSettings:
+    config = FakeConfig(  # noqa: S106
         org="test_org",
         bucket="test_bucket",
         write_token="test_token",
-        base_url=httpserver.url_for("/influx"),
+        base_url=f"http://127.0.0.1:{influxdb_port}/influx",
     )
-    return InfluxDBWriter(config)
+    return cast(InfluxSettings, config)
+
+
+@pytest.fixture(scope="module")
+def shared_influxdb_writer(influxdb_config: InfluxSettings) -> InfluxDBWriter:
+    return InfluxDBWriter(influxdb_config)
+
+
+@pytest.fixture
+def influxdb_writer(shared_influxdb_writer: InfluxDBWriter) -> InfluxDBWriter:
+    # Drop messages left over by a previous test
+    queue = shared_influxdb_writer._queue
+    while not queue.empty():
+        queue.get_nowait()
+    return shared_influxdb_writer
 
 
 @pytest.fixture
@@ -58,15 +119,18 @@ def patch_to_influx(mocker: MockerFixture) -> None:
     )
 
 
-def test_initializes_superclass(influxdb_writer: InfluxDBWriter) -> None:
+def test_initializes_superclass(influxdb_config: InfluxSettings) -> None:
+    influxdb_writer = InfluxDBWriter(influxdb_config)
     assert influxdb_writer._queue.empty()
+    assert influxdb_writer._queue.maxsize == QUEUE_MAXSIZE
 
 
 class TestFlatten:
-    @pytest.mark.parametrize("data", [None, 0, "string", []])
-    def test_non_dict_data(self, data: Any) -> None:
-        with pytest.raises(AttributeError):
-            flatten(data)
+    def test_non_dict_data(self) -> None:
+        non_dict_data: tuple[Any, ...] = (None, 0, "string", [])
+        for data in non_dict_data:
+            with pytest.raises(AttributeError):
+                flatten(data)
 
     def test_empty_data(self) -> None:
         assert flatten({}) == {}
@@ -99,11 +163,11 @@ class TestFlatten:
 
 @pytest.mark.usefixtures("patch_flatten")
 class TestToInflux:
-    @pytest.mark.parametrize("payload", ["string", 42, 5.4, True, None])
-    def test_scalar_payload(self, mocker: MockerFixture, payload: Any) -> None:
-        message = mocker.Mock(node_id="ScalarNode", payload=payload)
-        with pytest.raises(UnexpextedScalarError, match=r"ScalarNode"):
-            to_influx(message)
+    def test_scalar_payload(self, mocker: MockerFixture) -> None:
+        for payload in ("string", 42, 5.4, True, None):
+            message = mocker.Mock(node_id="ScalarNode", payload=payload)
+            with pytest.raises(UnexpextedScalarError, match=r"ScalarNode"):
+                to_influx(message)
 
     def test_scalar_array_payload(self, mocker: MockerFixture) -> None:
         data = [1, 2, 3]
@@ -120,10 +184,8 @@ class TestToInflux:
         )
 
     def test_dict_payload(self, mocker: MockerFixture) -> None:
-        data = {"field1": 1, "field2": "value 2", "field3": 1.0, "field4": False}
-        message = mocker.Mock(node_id='"dict"."node"', payload=data)
-        expected = 'dict.node field1=1i,field2="value 2",field3=1.0,field4=False '
-        assert to_influx(message) == expected
+        message = mocker.Mock(node_id='"dict"."node"', payload=DICT_PAYLOAD)
+        assert to_influx(message) == DICT_EXPECTED
 
     def test_field_value_error(self, mocker: MockerFixture) -> None:
         data = {"field1": 1, "field2": None}
@@ -133,28 +195,41 @@ class TestToInflux:
 
 
 @pytest.mark.asyncio
-@pytest.mark.usefixtures("patch_to_influx")
+@pytest.mark.usefixtures("influxdb_server", "patch_to_influx")
 class TestTask:
+    @pytest.fixture(scope="class")
+    def shared_fake_influxdb(self) -> FakeInfluxDB:
+        return FakeInfluxDB()
+
+    @pytest.fixture(scope="class")
+    async def influxdb_server(
+        self, influxdb_port: int, shared_fake_influxdb: FakeInfluxDB
+    ) -> AsyncIterator[RawTestServer]:
+        server = RawTestServer(shared_fake_influxdb.handler, port=influxdb_port)
+        await server.start_server()
+        yield server
+        await server.close()
+
+    @pytest.fixture
+    def fake_influxdb(self, shared_fake_influxdb: FakeInfluxDB) -> FakeInfluxDB:
+        shared_fake_influxdb.status = 204
+        shared_fake_influxdb.json_data = None
+        shared_fake_influxdb.requests.clear()
+        return shared_fake_influxdb
+
     async def test_request_success(
         self,
         event_loop: asyncio.AbstractEventLoop,
-        httpserver: HTTPServer,
+        fake_influxdb: FakeInfluxDB,
         influxdb_writer: InfluxDBWriter,
         log_records: LogRecordsType,
         mocker: MockerFixture,
+        post_handled: asyncio.Event,
     ) -> None:
-        httpserver.expect_oneshot_request(
-            "/influx/api/v2/write",
-            method="POST",
-            data="measurement,tag=tagval field=1.0 ",
-            headers={"Authorization": "Token test_token"},
-            query_string={"org": "test_org", "bucket": "test_bucket", "precision": "s"},
-        ).respond_with_json({}, status=204)
         task = event_loop.create_task(influxdb_writer.task())
         influxdb_writer.put(mocker.Mock())
-        await asyncio.sleep(0.1)
-        assert len(httpserver.log) > 0
-        httpserver.check_assertions()  # type: ignore
+        await asyncio.wait_for(post_handled.wait(), timeout=1.0)
+        assert fake_influxdb.requests == [EXPECTED_REQUEST]
         assert not any(r.levelno == logging.ERROR for r in log_records())
         task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
@@ -164,7 +239,7 @@ class TestTask:
         ["resp_json", "expected_message"],
         [
             ({"message": "error JSON"}, "error JSON"),
-            ({}, "NOT FOUND"),
+            ({}, "Not Found"),
         ],
         ids=[
             "InfluxDB error",
@@ -175,24 +250,19 @@ class TestTask:
         self,
         event_loop: asyncio.AbstractEventLoop,
         expected_message: str,
-        httpserver: HTTPServer,
+        fake_influxdb: FakeInfluxDB,
         influxdb_writer: InfluxDBWriter,
         log_records: LogRecordsType,
         mocker: MockerFixture,
+        post_handled: asyncio.Event,
         resp_json: dict[str, str],
     ) -> None:
-        httpserver.expect_oneshot_request(
-            "/influx/api/v2/write",
-            method="POST",
-            data="measurement,tag=tagval field=1.0 ",
-            headers={"Authorization": "Token test_token"},
-            query_string={"org": "test_org", "bucket": "test_bucket", "precision": "s"},
-        ).respond_with_json(resp_json, status=404)
+        fake_influxdb.status = 404
+        fake_influxdb.json_data = resp_json
         task = event_loop.create_task(influxdb_writer.task())
         influxdb_writer.put(mocker.Mock())
-        await asyncio.sleep(0.1)
-        assert len(httpserver.log) > 0
-        httpserver.check_assertions()  # type: ignore
+        await asyncio.wait_for(post_handled.wait(), timeout=1.0)
+        assert fake_influxdb.requests == [EXPECTED_REQUEST]
         last_log_record = log_records()[-1]
         assert last_log_record.levelno == logging.ERROR
         assert expected_message in last_log_record.message
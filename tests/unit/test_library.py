@@ -1,24 +1,19 @@
 import asyncio
 import logging
-from logging import LogRecord
-from typing import Any, Callable, Iterator, Type
+from typing import Any, Type
 
 import pytest
-from pytest import LogCaptureFixture
 
 from opcua_webhmi_bridge.library import QUEUE_MAXSIZE, AsyncTask, MessageConsumer
 
-LogRecordsType = Callable[[], Iterator[LogRecord]]
+from .conftest import CaptureLoggerType, LogRecordsType
 
 _logger = logging.getLogger("test_library")
 
 
 @pytest.fixture
-def log_records(caplog: LogCaptureFixture) -> LogRecordsType:
-    def inner() -> Iterator[LogRecord]:
-        return filter(lambda r: r.name == _logger.name, caplog.records)
-
-    return inner
+def log_records(capture_logger: CaptureLoggerType) -> LogRecordsType:
+    return capture_logger(_logger)
 
 
 @pytest.fixture
@@ -49,14 +44,13 @@ class TestAsyncTask:
     def test_instanciates(self, async_task: Type[AsyncTask]) -> None:
         async_task()
 
-    @pytest.mark.filterwarnings("ignore::RuntimeWarning")
-    def test_task_scheduled(
+    async def test_task_scheduled(
         self, async_task: Type[AsyncTask], event_loop: asyncio.AbstractEventLoop
     ) -> None:
         instance = async_task()
-        assert len(asyncio.all_tasks(event_loop)) == 0
-        instance.run(event_loop)
-        assert asyncio.all_tasks(event_loop).pop().get_name() == instance.purpose
+        task = instance.run(event_loop)
+        assert task.get_name() == instance.purpose
+        await task
 
 
 class TestMessageConsumer:
@@ -73,6 +67,6 @@ class TestMessageConsumer:
             instance.put("message")
         assert not any(r.levelno == logging.ERROR for r in log_records())
         instance.put("overflow")
-        last_record = list(log_records())[-1]
+        last_record = log_records()[-1]
         assert last_record.levelno == logging.ERROR
         assert "message queue full" in last_record.message
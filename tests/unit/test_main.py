@@ -1,18 +1,25 @@
 import asyncio
 import logging
 import re
+from dataclasses import dataclass
 from pathlib import Path
 from signal import SIGINT
-from typing import Callable
+from typing import Any, Callable, Iterator
 from unittest.mock import AsyncMock as AsyncMockType
 
+import click
 import pytest
-from pytest import LogCaptureFixture
+import typer
+from pytest import CaptureFixture
 from pytest_mock import MockerFixture
-from typer.testing import CliRunner
 
-from opcua_webhmi_bridge.config import ConfigError
-from opcua_webhmi_bridge.main import _logger, app, handle_exception, shutdown
+from opcua_webhmi_bridge import main as main_module
+from opcua_webhmi_bridge.config import ConfigError, Settings
+from opcua_webhmi_bridge.main import _logger, app, handle_exception, main, shutdown
+
+from .conftest import CaptureLoggerType, LogRecordsType
+
+HELP_LINE_PATTERN = re.compile(r"ENV_VAR_\d[ \t]+Help text \d")
 
 
 class ExceptionForTestingError(Exception):
@@ -20,191 +27,175 @@ class ExceptionForTestingError(Exception):
 
 
 async def dummy_task() -> None:
-    while True:
-        await asyncio.sleep(0.1)
+    # Parks until cancelled, the event is never set
+    await asyncio.Event().wait()
 
 
 async def raising_task() -> None:
     try:
-        while True:
-            await asyncio.sleep(0.1)
+        await asyncio.Event().wait()
     except asyncio.CancelledError:
         raise ExceptionForTestingError("Exception for testing")
 
 
-LogRecordsType = Callable[[], list[logging.LogRecord]]
-
-
 @pytest.fixture
-def log_records(caplog: LogCaptureFixture) -> LogRecordsType:
-    caplog.set_level(logging.INFO)
-
-    def _inner() -> list[logging.LogRecord]:
-        return list(filter(lambda r: r.name == _logger.name, caplog.records))
-
-    return _inner
+def log_records(capture_logger: CaptureLoggerType) -> LogRecordsType:
+    return capture_logger(_logger)
 
 
 @pytest.fixture
-def dummy_tasks(event_loop: asyncio.AbstractEventLoop) -> None:
-    for index in range(5):
-        event_loop.create_task(dummy_task(), name=f"dummy{index}")
+def shutdown_loop() -> Iterator[asyncio.AbstractEventLoop]:
+    # shutdown() stops the loop and finalizes its async generators,
+    # so it must not run on the shared event loop
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
 
 
 @pytest.fixture
-def cli_runner() -> CliRunner:
-    return CliRunner()
+def dummy_tasks(shutdown_loop: asyncio.AbstractEventLoop) -> None:
+    for index in range(5):
+        shutdown_loop.create_task(dummy_task(), name=f"dummy{index}")
 
 
 @pytest.fixture
 def patched_shutdown(mocker: MockerFixture) -> AsyncMockType:
-    return mocker.patch("opcua_webhmi_bridge.main.shutdown")
+    return mocker.patch.object(main_module, "shutdown")
 
 
 class TestShutdown:
     @pytest.mark.usefixtures("dummy_tasks")
-    def test_cleanup_no_exception(self, event_loop: asyncio.AbstractEventLoop) -> None:
-        assert len(asyncio.all_tasks(event_loop)) == 5
-        event_loop.run_until_complete(shutdown())
-        assert not event_loop.is_running()
+    def test_cleanup_no_exception(
+        self, shutdown_loop: asyncio.AbstractEventLoop
+    ) -> None:
+        assert len(asyncio.all_tasks(shutdown_loop)) == 5
+        shutdown_loop.run_until_complete(shutdown())
+        assert not shutdown_loop.is_running()
 
     @pytest.mark.usefixtures("dummy_tasks")
     def test_cleanup_with_exception(
         self,
-        event_loop: asyncio.AbstractEventLoop,
         log_records: LogRecordsType,
+        shutdown_loop: asyncio.AbstractEventLoop,
     ) -> None:
-        event_loop.create_task(raising_task())
-        assert len(asyncio.all_tasks(event_loop)) == 6
-        event_loop.run_until_complete(shutdown())
-        assert not event_loop.is_running()
+        shutdown_loop.create_task(raising_task())
+        assert len(asyncio.all_tasks(shutdown_loop)) == 6
+        shutdown_loop.run_until_complete(shutdown())
+        assert not shutdown_loop.is_running()
         last_log_record = log_records()[-1]
         assert last_log_record.levelno == logging.ERROR
         assert "Exception for testing" in last_log_record.message
 
     def test_signal_logged(
         self,
-        event_loop: asyncio.AbstractEventLoop,
         log_records: LogRecordsType,
+        shutdown_loop: asyncio.AbstractEventLoop,
     ) -> None:
-        event_loop.run_until_complete(shutdown(SIGINT))
-        expected_record = [
-            rec for rec in log_records() if "Received exit signal SIGINT" in rec.message
-        ]
-        assert len(expected_record)
+        shutdown_loop.run_until_complete(shutdown(SIGINT))
+        assert any(
+            "Received exit signal SIGINT" in rec.message for rec in log_records()
+        )
 
 
-class TestExceptionHandler:
-    def test_with_exc_and_task(
-        self,
-        event_loop: asyncio.AbstractEventLoop,
-        log_records: LogRecordsType,
-        mocker: MockerFixture,
-        patched_shutdown: AsyncMockType,
-    ) -> None:
-        context = {
-            "exception": ExceptionForTestingError("Exception handler test"),
-            "future": mocker.Mock(**{"get_name.return_value": "test_task"}),
-        }
-        handle_exception(event_loop, context)
-        event_loop.stop()
-        event_loop.run_forever()
-        expected_record = [
-            rec
-            for rec in log_records()
-            if rec.levelno == logging.ERROR
-            and "ExceptionForTesting" in rec.message
-            and "test_task" in rec.message
-            and "Exception handler test" in rec.message
-        ]
-        assert len(expected_record)
-        assert patched_shutdown.called
+ContextFactory = Callable[[asyncio.AbstractEventLoop, MockerFixture], dict[str, Any]]
+
+
+@dataclass
+class ExceptionHandlerTestCase:
+    context_factory: ContextFactory
+    expected_substrings: list[str]
 
-    def test_with_exc_and_future(
-        self,
-        event_loop: asyncio.AbstractEventLoop,
-        log_records: LogRecordsType,
-        patched_shutdown: AsyncMockType,
-    ) -> None:
-        context = {
-            "exception": ExceptionForTestingError("Exception handler test"),
-            "future": asyncio.Future(loop=event_loop),
-        }
-        handle_exception(event_loop, context)
-        event_loop.stop()
-        event_loop.run_forever()
-        expected_record = [
-            rec
-            for rec in log_records()
-            if rec.levelno == logging.ERROR
-            and "ExceptionForTesting" in rec.message
-            and "unknown" in rec.message
-            and "Exception handler test" in rec.message
-        ]
-        assert len(expected_record)
-        assert patched_shutdown.called
 
-    def test_with_message(
+class TestExceptionHandler:
+    @pytest.mark.parametrize(
+        "testcase",
+        [
+            ExceptionHandlerTestCase(
+                lambda _, mocker: {
+                    "exception": ExceptionForTestingError("Exception handler test"),
+                    "future": mocker.Mock(**{"get_name.return_value": "test_task"}),
+                },
+                ["ExceptionForTesting", "test_task", "Exception handler test"],
+            ),
+            ExceptionHandlerTestCase(
+                lambda loop, _: {
+                    "exception": ExceptionForTestingError("Exception handler test"),
+                    "future": asyncio.Future(loop=loop),
+                },
+                ["ExceptionForTesting", "unknown", "Exception handler test"],
+            ),
+            ExceptionHandlerTestCase(
+                lambda *_: {"message": "exception message"},
+                ["exception message"],
+            ),
+        ],
+        ids=[
+            "Exception and task",
+            "Exception and future",
+            "Message",
+        ],
+    )
+    async def test_exception_handled(
         self,
         event_loop: asyncio.AbstractEventLoop,
         log_records: LogRecordsType,
+        mocker: MockerFixture,
         patched_shutdown: AsyncMockType,
+        testcase: ExceptionHandlerTestCase,
     ) -> None:
-        context = {"message": "exception message"}
-        handle_exception(event_loop, context)
-        event_loop.stop()
-        event_loop.run_forever()
-        expected_record = [
-            rec
+        handle_exception(event_loop, testcase.context_factory(event_loop, mocker))
+        # One loop iteration runs the scheduled shutdown task
+        await asyncio.sleep(0)
+        assert any(
+            rec.levelno == logging.ERROR
+            and all(s in rec.message for s in testcase.expected_substrings)
             for rec in log_records()
-            if rec.levelno == logging.ERROR and "exception message" in rec.message
-        ]
-        assert len(expected_record)
-        assert patched_shutdown.called
+        )
+        assert patched_shutdown.await_count == 1
 
 
 class TestApp:
-    def test_help(
-        self,
-        cli_runner: CliRunner,
-        mocker: MockerFixture,
-    ) -> None:
-        mocker.patch(
-            "opcua_webhmi_bridge.main.Settings.help",
+    def test_help(self, mocker: MockerFixture) -> None:
+        mocker.patch.object(
+            Settings,
+            "help",
             return_value=[
                 ("ENV_VAR_1", "Help text 1"),
                 ("ENV_VAR_2", "Help text 2"),
             ],
         )
-        result = cli_runner.invoke(app, "--help")
-        env_var_help_lines = re.findall(r"ENV_VAR_\d[ \t]+Help text \d", result.output)
+        command = typer.main.get_command(app)
+        help_text = command.get_help(click.Context(command))
+        env_var_help_lines = HELP_LINE_PATTERN.findall(help_text)
         assert len(env_var_help_lines) == 2
 
     def test_env_config_error(
         self,
-        cli_runner: CliRunner,
         log_records: LogRecordsType,
         mocker: MockerFixture,
     ) -> None:
-        patched_settings = mocker.patch(
-            "opcua_webhmi_bridge.main.Settings",
+        patched_settings = mocker.patch.object(
+            main_module,
+            "Settings",
             side_effect=ConfigError(None, "config error"),
         )
-        result = cli_runner.invoke(app, "--env-file=/path/to/env/file")
+        with pytest.raises(SystemExit) as exc_info:
+            main(env_file=Path("/path/to/env/file"), print_config=False, verbose=False)
         assert patched_settings.call_args_list == [
             mocker.call(Path("/path/to/env/file"))
         ]
-        expected_record = [
-            rec
+        assert any(
+            rec.levelno == logging.CRITICAL and "config error" in rec.message
             for rec in log_records()
-            if rec.levelno == logging.CRITICAL and "config error" in rec.message
-        ]
-        assert len(expected_record)
-        assert result.exit_code == 2
+        )
+        assert exc_info.value.code == 2
 
-    def test_print_config(self, cli_runner: CliRunner, mocker: MockerFixture) -> None:
-        patched_settings = mocker.patch("opcua_webhmi_bridge.main.Settings")
+    def test_print_config(
+        self, capsys: CaptureFixture[str], mocker: MockerFixture
+    ) -> None:
+        patched_settings = mocker.patch.object(main_module, "Settings")
         patched_settings.return_value.__str__.return_value = "settings instance"
-        result = cli_runner.invoke(app, "--config")
-        assert "settings instance" in result.output
-        assert result.exit_code == 0
+        with pytest.raises(SystemExit) as exc_info:
+            main(env_file=None, print_config=True, verbose=False)
+        assert "settings instance" in capsys.readouterr().out
+        assert exc_info.value.code is None
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Any
 from unittest.mock import Mock
 
 import pytest
@@ -57,8 +58,9 @@ def test_message_frontend_data() -> None:
     }
 
 
-def test_opc_data_conversion() -> None:
-    opc_data = [
+@pytest.fixture(scope="module")
+def opc_root_data() -> list[RootType]:
+    return [
         RootType(
             SubType1("abcd", 1),
             SubType2(False, SubType1("efgh", 2)),
@@ -70,8 +72,11 @@ def test_opc_data_conversion() -> None:
             False,
         ),
     ]
-    message = OPCDataMessage("test_node", opc_data)
-    assert message.payload == [
+
+
+@pytest.fixture(scope="module")
+def opc_root_payload() -> list[dict[str, Any]]:
+    return [
         {
             "field1": {"field1": "abcd", "field2": 1},
             "field2": {"field1": False, "field2": {"field1": "efgh", "field2": 2}},
@@ -83,3 +88,10 @@ def test_opc_data_conversion() -> None:
             "field3": False,
         },
     ]
+
+
+def test_opc_data_conversion(
+    opc_root_data: list[RootType], opc_root_payload: list[dict[str, Any]]
+) -> None:
+    message = OPCDataMessage("test_node", opc_root_data)
+    assert message.payload == opc_root_payload
@@ -1,16 +1,26 @@
 import asyncio
 import contextlib
 import logging
-import time
-from typing import Any, Callable, Iterator, cast
-from unittest.mock import AsyncMock, Mock
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Protocol, cast
+from unittest.mock import AsyncMock, Mock, sentinel
 
+import asyncua
 import pytest
+import tenacity
 from asyncua.crypto.security_policies import SecurityPolicyBasic256Sha256
-from asyncua.ua import NodeId, ObjectIds
-from pytest import LogCaptureFixture
+from asyncua.ua import NodeId, ObjectIds, StatusCode, StatusCodes
+from asyncua.ua.uaerrors import UaStatusCodeError
 from pytest_mock import MockerFixture
 
+from opcua_webhmi_bridge import opcua as opcua_module
+from opcua_webhmi_bridge.config import OPCSettings
+from opcua_webhmi_bridge.frontend_messaging import (
+    CentrifugoProxyServer,
+    FrontendMessagingWriter,
+)
+from opcua_webhmi_bridge.influxdb import InfluxDBWriter
 from opcua_webhmi_bridge.messages import LinkStatus
 from opcua_webhmi_bridge.opcua import (
     SIMATIC_NAMESPACE_URI,
@@ -18,7 +28,7 @@ from opcua_webhmi_bridge.opcua import (
     OPCUAClient,
 )
 
-LogRecordsType = Callable[[], list[logging.LogRecord]]
+from .conftest import CaptureLoggerType, LogRecordsType
 
 
 class ExceptionForTestingError(Exception):
@@ -29,40 +39,82 @@ class InfiniteLoopBreakerError(Exception):
     pass
 
 
-class FakeUaStatusCodeError(Exception):
-    pass
+class LinkStatusRequest(Protocol):
+    param: LinkStatus
 
 
 @pytest.fixture
-def log_records(caplog: LogCaptureFixture) -> LogRecordsType:
-    caplog.set_level(logging.INFO)
-
-    def _inner() -> list[logging.LogRecord]:
-        return list(
-            filter(
-                lambda r: r.name == OPCUAClient.logger.name,
-                caplog.records,
-            )
-        )
-
-    return _inner
+def log_records(capture_logger: CaptureLoggerType) -> LogRecordsType:
+    return capture_logger(OPCUAClient.logger)
 
 
-@pytest.fixture
-def opcua_client(mocker: MockerFixture) -> OPCUAClient:
-    config = mocker.Mock(
+@pytest.fixture(scope="module")
+def shared_opcua_client(module_mocker: MockerFixture) -> OPCUAClient:
+    config = SimpleNamespace(
+        server_url="//opc/server.url",
+        cert_file=None,
+        private_key_file=None,
         monitor_nodes=["monitornode1", "monitornode2"],
         record_nodes=["recnode1", "recnode2"],
         record_interval=42,
         retry_delay=1234,
     )
-    centrifugo_proxy_server = mocker.Mock(last_opc_status=None)
-    return OPCUAClient(config, centrifugo_proxy_server, mocker.Mock(), mocker.Mock())
+    # last_opc_status is an instance attribute, out of reach of spec_set
+    centrifugo_proxy_server = module_mocker.Mock(
+        spec=CentrifugoProxyServer, last_opc_status=None
+    )
+    return OPCUAClient(
+        cast(OPCSettings, config),
+        centrifugo_proxy_server,
+        module_mocker.Mock(spec_set=InfluxDBWriter),
+        module_mocker.Mock(spec_set=FrontendMessagingWriter),
+    )
+
+
+@pytest.fixture
+def opcua_client(shared_opcua_client: OPCUAClient) -> OPCUAClient:
+    shared_opcua_client._status = LinkStatus.Down
+    centrifugo_proxy_server = cast(Mock, shared_opcua_client._centrifugo_proxy_server)
+    centrifugo_proxy_server.reset_mock()
+    centrifugo_proxy_server.last_opc_status = None
+    cast(Mock, shared_opcua_client._influx_writer).reset_mock()
+    cast(Mock, shared_opcua_client._frontend_messaging_writer).reset_mock()
+    return shared_opcua_client
+
+
+# Mocks below are built once per module, but only patched in for the tests
+# requesting them, so they do not leak into the others
+@pytest.fixture(scope="module")
+def shared_status_message_mock(module_mocker: MockerFixture) -> Mock:
+    mocked: Mock = module_mocker.MagicMock()
+    return mocked
+
+
+@pytest.fixture
+def status_message_mock(
+    mocker: MockerFixture, shared_status_message_mock: Mock
+) -> Mock:
+    shared_status_message_mock.reset_mock()
+    mocker.patch.object(
+        opcua_module, "OPCStatusMessage", new=shared_status_message_mock
+    )
+    return shared_status_message_mock
+
+
+@pytest.fixture(scope="module")
+def shared_mocked_asyncua_client(module_mocker: MockerFixture) -> Mock:
+    mocked: Mock = module_mocker.MagicMock()
+    mocked.return_value.set_security = module_mocker.AsyncMock()
+    return mocked
 
 
 @pytest.fixture
-def status_message_mock(mocker: MockerFixture) -> Mock:
-    return mocker.patch("opcua_webhmi_bridge.opcua.OPCStatusMessage")
+def mocked_asyncua_client(
+    mocker: MockerFixture, shared_mocked_asyncua_client: Mock
+) -> Mock:
+    shared_mocked_asyncua_client.reset_mock()
+    mocker.patch.object(asyncua, "Client", new=shared_mocked_asyncua_client)
+    return shared_mocked_asyncua_client
 
 
 def test_status_initialized(opcua_client: OPCUAClient) -> None:
@@ -84,25 +136,29 @@ def test_status_initialized(opcua_client: OPCUAClient) -> None:
         "With credentials and encryption",
     ],
 )
-def test_create_opc_client(
-    event_loop: asyncio.AbstractEventLoop,
+async def test_create_opc_client(
     expect_user_pass: bool,
+    mocked_asyncua_client: Mock,
     mocker: MockerFixture,
     url: str,
     with_cert_file: bool,
 ) -> None:
-    mocked_asyncua_client = mocker.patch("asyncua.Client")
-    mocked_asyncua_client.return_value.set_security = mocker.AsyncMock()
-    config = mocker.Mock(server_url=url)
-    if with_cert_file:
-        config.configure_mock(cert_file="certFile", private_key_file="keyFile")
+    # Server URL is parsed at construction, so each case needs its own client
+    config = SimpleNamespace(
+        server_url=url,
+        cert_file="certFile" if with_cert_file else None,
+        private_key_file="keyFile" if with_cert_file else None,
+    )
+    client = OPCUAClient(
+        cast(OPCSettings, config), mocker.Mock(), mocker.Mock(), mocker.Mock()
+    )
+    assert client._server_url == "//opc/server.url"
+    if expect_user_pass:
+        assert (client._server_user, client._server_password) == ("user", "pass")
     else:
-        config.configure_mock(cert_file=None, private_key_file=None)
-    opcua_client = OPCUAClient(config, mocker.Mock(), mocker.Mock(), mocker.Mock())
-    created_client = event_loop.run_until_complete(opcua_client._create_opc_client())
-    assert mocked_asyncua_client.call_args_list == [mocker.call(url="//opc/server.url")]
-    set_user = cast(Mock, created_client.set_user)
-    set_password = cast(Mock, created_client.set_password)
+        assert (client._server_user, client._server_password) == (None, None)
+    created_client = await client._create_opc_client()
+    mocked_asyncua_client.assert_called_once_with(url="//opc/server.url")
     expected_set_user_call = []
     expected_set_pw_call = []
     expected_set_security_call = []
@@ -113,131 +169,137 @@ def test_create_opc_client(
         expected_set_security_call.append(
             mocker.call(SecurityPolicyBasic256Sha256, "certFile", "keyFile")
         )
-    assert set_user.call_args_list == expected_set_user_call
-    assert set_password.call_args_list == expected_set_pw_call
+    assert created_client.set_user.call_args_list == expected_set_user_call
+    assert created_client.set_password.call_args_list == expected_set_pw_call
     assert created_client.set_security.await_args_list == expected_set_security_call
 
 
+@dataclass
+class SubscribeTestCase:
+    results: list[int | StatusCode]
+    failed_node: str | None
+    monitor_nodes: list[str] = field(
+        default_factory=lambda: ["monitornode1", "monitornode2"]
+    )
+
+
 @pytest.mark.parametrize(
-    "subscription_success",
-    [True, False],
-    ids=["Subscription success", "Subscription error"],
+    "testcase",
+    [
+        SubscribeTestCase([12, 34], None),
+        SubscribeTestCase([StatusCode(StatusCodes.Good), 34], None),
+        SubscribeTestCase(
+            [StatusCode(StatusCodes.BadNodeIdUnknown), 34], "monitornode1"
+        ),
+        SubscribeTestCase(
+            [12, StatusCode(StatusCodes.BadNodeIdUnknown)], "monitornode2"
+        ),
+        SubscribeTestCase([], None, []),
+    ],
+    ids=[
+        "Subscription success",
+        "Good status code",
+        "First node error",
+        "Last node error",
+        "No node to monitor",
+    ],
 )
-def test_subscribe(
-    event_loop: asyncio.AbstractEventLoop,
+async def test_subscribe(
     log_records: LogRecordsType,
     mocker: MockerFixture,
     opcua_client: OPCUAClient,
-    subscription_success: bool,
+    testcase: SubscribeTestCase,
 ) -> None:
-    mocked_client = mocker.MagicMock()
-    nsi = mocker.sentinel.nsi
-    mocker.patch("opcua_webhmi_bridge.opcua.UaStatusCodeError", FakeUaStatusCodeError)
+    mocker.patch.object(opcua_client._config, "monitor_nodes", testcase.monitor_nodes)
+    mocked_client = mocker.Mock()
+    nsi = sentinel.nsi
     mocked_client.create_subscription = mocker.AsyncMock()
     subscription = mocked_client.create_subscription.return_value
-    sub_results: list[int | FakeUaStatusCodeError] = [12, 34]
-    if not subscription_success:
-        sub_results[-1] = FakeUaStatusCodeError()
-    subscription.subscribe_data_change = mocker.AsyncMock(side_effect=sub_results)
-
-    cm: contextlib.AbstractContextManager[Any]
-    if subscription_success:
-        cm = contextlib.suppress(InfiniteLoopBreakerError)
+    subscription.subscribe_data_change = mocker.AsyncMock(return_value=testcase.results)
+
+    if testcase.failed_node is None:
+        await opcua_client._subscribe(mocked_client, nsi)
     else:
-        cm = pytest.raises(FakeUaStatusCodeError)
-    with cm:
-        event_loop.run_until_complete(opcua_client._subscribe(mocked_client, nsi))
+        with pytest.raises(UaStatusCodeError):
+            await opcua_client._subscribe(mocked_client, nsi)
 
-    assert mocked_client.create_subscription.await_args_list == [
-        mocker.call(1000, opcua_client)
-    ]
-    get_node = cast(Mock, mocked_client.get_node)
+    mocked_client.create_subscription.assert_awaited_once_with(1000, opcua_client)
+    get_node = mocked_client.get_node
     assert get_node.call_args_list == [
-        mocker.call(NodeId("monitornode1", mocker.sentinel.nsi)),
-        mocker.call(NodeId("monitornode2", mocker.sentinel.nsi)),
-    ]
-    assert subscription.subscribe_data_change.await_args_list == [
-        mocker.call(get_node.return_value),
-        mocker.call(get_node.return_value),
+        mocker.call(NodeId(node_id, sentinel.nsi)) for node_id in testcase.monitor_nodes
     ]
-    if not subscription_success:
+    if testcase.monitor_nodes:
+        subscription.subscribe_data_change.assert_awaited_once_with(
+            [get_node.return_value] * len(testcase.monitor_nodes)
+        )
+    else:
+        subscription.subscribe_data_change.assert_not_awaited()
+    if testcase.failed_node is None:
+        assert not any(r.levelno == logging.ERROR for r in log_records())
+    else:
         last_log_record = log_records()[-1]
         assert last_log_record.levelno == logging.ERROR
         assert "Error subscribing to node" in last_log_record.message
+        assert testcase.failed_node in last_log_record.message
 
 
-def test_poll_status(
-    event_loop: asyncio.AbstractEventLoop,
+async def test_poll_status(
     mocker: MockerFixture,
     opcua_client: OPCUAClient,
 ) -> None:
-    mocked_client = mocker.MagicMock()
-    mocked_sleep = mocker.patch("asyncio.sleep")
-    mocked_read_data_value = mocker.AsyncMock(
-        side_effect=[None, None, InfiniteLoopBreakerError]
+    mocked_client = mocker.Mock()
+    mocked_sleep = mocker.patch.object(
+        asyncio, "sleep", side_effect=[None, None, InfiniteLoopBreakerError]
     )
+    mocked_read_data_value = mocker.AsyncMock()
     mocked_client.get_node.return_value.read_data_value = mocked_read_data_value
 
     with contextlib.suppress(InfiniteLoopBreakerError):
-        event_loop.run_until_complete(opcua_client._poll_status(mocked_client))
+        await opcua_client._poll_status(mocked_client)
 
-    assert mocked_client.get_node.call_args_list == [
-        mocker.call(ObjectIds.Server_ServerStatus_State)
-    ]
+    mocked_client.get_node.assert_called_once_with(ObjectIds.Server_ServerStatus_State)
     assert mocked_sleep.await_args_list == [
         mocker.call(STATE_POLL_INTERVAL),
         mocker.call(STATE_POLL_INTERVAL),
         mocker.call(STATE_POLL_INTERVAL),
     ]
-    assert mocked_read_data_value.await_count == 3
-
-
-def read_values_side_effect(
-    *args: Any, **kwargs: Any  # noqa: U100
-) -> Iterator[list[str]]:
-    pass_count = 0
-    while True:
-        if pass_count == 0:
-            yield ["val1", "val2"]
-        elif pass_count == 1:
-            time.sleep(0.5)
-            yield ["val3", "val4"]
-        elif pass_count >= 2:
-            raise InfiniteLoopBreakerError()
-        pass_count += 1
-
-
-def test_poll_nodes(
-    event_loop: asyncio.AbstractEventLoop,
+    assert mocked_read_data_value.await_count == 2
+
+
+async def test_poll_nodes(
     mocker: MockerFixture,
     opcua_client: OPCUAClient,
 ) -> None:
-    mocked_client = mocker.MagicMock()
+    mocked_client = mocker.Mock()
     mocked_nodes = [
-        mocker.Mock(**{"nodeid.Identifier": mocker.sentinel.node1}),
-        mocker.Mock(**{"nodeid.Identifier": mocker.sentinel.node2}),
+        mocker.Mock(**{"nodeid.Identifier": sentinel.node1}),
+        mocker.Mock(**{"nodeid.Identifier": sentinel.node2}),
     ]
     mocked_client.get_node.side_effect = mocked_nodes
-    mocked_client.read_values = mocker.AsyncMock(side_effect=read_values_side_effect())
-    data_message_mock = mocker.patch(
-        "opcua_webhmi_bridge.opcua.OPCDataMessage",
+    mocked_client.read_values = mocker.AsyncMock(
+        side_effect=[["val1", "val2"], ["val3", "val4"], InfiniteLoopBreakerError]
+    )
+    data_message_mock = mocker.patch.object(
+        opcua_module,
+        "OPCDataMessage",
         side_effect=[
-            mocker.sentinel.message1,
-            mocker.sentinel.message2,
-            mocker.sentinel.message3,
-            mocker.sentinel.message4,
+            sentinel.message1,
+            sentinel.message2,
+            sentinel.message3,
+            sentinel.message4,
         ],
     )
-    mocked_sleep = mocker.patch("asyncio.sleep")
+    mocked_sleep = mocker.patch.object(asyncio, "sleep")
+    # Second read lasts half a second, third one breaks the loop
+    mocked_time = mocker.patch.object(opcua_module, "time")
+    mocked_time.monotonic.side_effect = [0.0, 0.0, 0.0, 0.5, 0.5]
 
     with contextlib.suppress(InfiniteLoopBreakerError):
-        event_loop.run_until_complete(
-            opcua_client._poll_nodes(mocked_client, mocker.sentinel.nsi)
-        )
+        await opcua_client._poll_nodes(mocked_client, sentinel.nsi)
 
     assert mocked_client.get_node.call_args_list == [
-        mocker.call(NodeId("recnode1", mocker.sentinel.nsi)),
-        mocker.call(NodeId("recnode2", mocker.sentinel.nsi)),
+        mocker.call(NodeId("recnode1", sentinel.nsi)),
+        mocker.call(NodeId("recnode2", sentinel.nsi)),
     ]
     assert mocked_client.read_values.await_args_list == [
         mocker.call(mocked_nodes),
@@ -245,26 +307,25 @@ def test_poll_nodes(
         mocker.call(mocked_nodes),
     ]
     assert mocked_sleep.await_args_list == [
-        mocker.call(pytest.approx(42, abs=0.1)),
-        mocker.call(pytest.approx(41.5, abs=0.1)),
+        mocker.call(42),
+        mocker.call(41.5),
     ]
     assert data_message_mock.call_args_list == [
-        mocker.call(mocker.sentinel.node1, "val1"),
-        mocker.call(mocker.sentinel.node2, "val2"),
-        mocker.call(mocker.sentinel.node1, "val3"),
-        mocker.call(mocker.sentinel.node2, "val4"),
+        mocker.call(sentinel.node1, "val1"),
+        mocker.call(sentinel.node2, "val2"),
+        mocker.call(sentinel.node1, "val3"),
+        mocker.call(sentinel.node2, "val4"),
     ]
     mocked_influx_put = cast(Mock, opcua_client._influx_writer.put)
     assert mocked_influx_put.call_args_list == [
-        mocker.call(mocker.sentinel.message1),
-        mocker.call(mocker.sentinel.message2),
-        mocker.call(mocker.sentinel.message3),
-        mocker.call(mocker.sentinel.message4),
+        mocker.call(sentinel.message1),
+        mocker.call(sentinel.message2),
+        mocker.call(sentinel.message3),
+        mocker.call(sentinel.message4),
     ]
 
 
-def test_task(
-    event_loop: asyncio.AbstractEventLoop,
+async def test_task(
     mocker: MockerFixture,
     opcua_client: OPCUAClient,
 ) -> None:
@@ -275,41 +336,39 @@ def test_task(
     mocker.patch.object(
         opcua_client, "_poll_nodes", side_effect=ExceptionForTestingError
     )
-    type_node = mocker.sentinel.type_node
-    mocked_client.get_namespace_index = mocker.AsyncMock(
-        return_value=mocker.sentinel.ns
-    )
+    type_node = sentinel.type_node
+    mocked_client.get_namespace_index = mocker.AsyncMock(return_value=sentinel.ns)
     mocked_client.nodes.opc_binary.get_child = mocker.AsyncMock(return_value=type_node)
     mocked_client.load_type_definitions = mocker.AsyncMock()
 
     with pytest.raises(ExceptionForTestingError):
-        event_loop.run_until_complete(opcua_client._task())
+        await opcua_client._task()
 
     assert mocked_client.__aenter__.await_count == 1
-    assert mocked_client.get_namespace_index.await_args_list == [
-        mocker.call(SIMATIC_NAMESPACE_URI)
-    ]
-    assert mocked_client.nodes.opc_binary.get_child.await_args_list == [
-        mocker.call("sentinel.ns:SimaticStructures")
-    ]
-    assert mocked_client.load_type_definitions.await_args_list == [
-        mocker.call([type_node])
-    ]
+    mocked_client.get_namespace_index.assert_awaited_once_with(SIMATIC_NAMESPACE_URI)
+    mocked_client.nodes.opc_binary.get_child.assert_awaited_once_with(
+        "sentinel.ns:SimaticStructures"
+    )
+    mocked_client.load_type_definitions.assert_awaited_once_with([type_node])
     mocked_subscribe = cast(AsyncMock, opcua_client._subscribe)
-    assert mocked_subscribe.await_args_list == [
-        mocker.call(mocked_client, mocker.sentinel.ns)
-    ]
+    mocked_subscribe.assert_awaited_once_with(mocked_client, sentinel.ns)
     mocked_poll_status = cast(AsyncMock, opcua_client._poll_status)
-    assert mocked_poll_status.await_args_list == [mocker.call(mocked_client)]
+    mocked_poll_status.assert_awaited_once_with(mocked_client)
     mocked_poll_nodes = cast(AsyncMock, opcua_client._poll_nodes)
-    assert mocked_poll_nodes.await_args_list == [
-        mocker.call(mocked_client, mocker.sentinel.ns)
-    ]
+    mocked_poll_nodes.assert_awaited_once_with(mocked_client, sentinel.ns)
+
+
+@pytest.fixture
+def opcua_client_with_status(
+    opcua_client: OPCUAClient, request: LinkStatusRequest
+) -> OPCUAClient:
+    opcua_client._status = request.param
+    return opcua_client
 
 
 class TestSetStatus:
     @pytest.mark.parametrize(
-        ["new_status", "clear_last_opc_data_call_count"],
+        ["opcua_client_with_status", "clear_last_opc_data_call_count"],
         [
             (LinkStatus.Down, 1),
             (LinkStatus.Up, 0),
@@ -318,66 +377,58 @@ class TestSetStatus:
             LinkStatus.Down,
             LinkStatus.Up,
         ],
+        indirect=["opcua_client_with_status"],
     )
     def test_same_status(
         self,
         clear_last_opc_data_call_count: int,
         status_message_mock: Mock,
-        mocker: MockerFixture,
-        new_status: LinkStatus,
-        opcua_client: OPCUAClient,
+        opcua_client_with_status: OPCUAClient,
     ) -> None:
-        opcua_client._status = new_status
-        opcua_client.set_status(new_status)
-        clear_last_opc_data = cast(
-            Mock, opcua_client._centrifugo_proxy_server.clear_last_opc_data
-        )
+        status = opcua_client_with_status._status
+        opcua_client_with_status.set_status(status)
+        message_instance = status_message_mock.return_value
+        proxy_server = opcua_client_with_status._centrifugo_proxy_server
+        clear_last_opc_data = cast(Mock, proxy_server.clear_last_opc_data)
         assert clear_last_opc_data.call_count == clear_last_opc_data_call_count
-        assert status_message_mock.call_args_list == [mocker.call(payload=new_status)]
-        assert (
-            opcua_client._centrifugo_proxy_server.last_opc_status
-            == status_message_mock.return_value
-        )
+        status_message_mock.assert_called_once_with(payload=status)
+        assert proxy_server.last_opc_status == message_instance
 
     def test_status_changed(
         self,
         status_message_mock: Mock,
-        mocker: MockerFixture,
         opcua_client: OPCUAClient,
     ) -> None:
         opcua_client.set_status(LinkStatus.Up)
         assert opcua_client._status == LinkStatus.Up
+        message_instance = status_message_mock.return_value
         messaging_writer_put = cast(Mock, opcua_client._frontend_messaging_writer.put)
-        assert messaging_writer_put.call_args_list == [
-            mocker.call(status_message_mock.return_value)
-        ]
-        assert status_message_mock.call_args_list == [
-            mocker.call(payload=LinkStatus.Up)
-        ]
+        messaging_writer_put.assert_called_once_with(message_instance)
+        status_message_mock.assert_called_once_with(payload=LinkStatus.Up)
 
 
 def test_datachange_notification(
     mocker: MockerFixture,
     opcua_client: OPCUAClient,
 ) -> None:
-    data_change_message_mock = mocker.patch("opcua_webhmi_bridge.opcua.OPCDataMessage")
+    data_change_message_mock = mocker.patch.object(opcua_module, "OPCDataMessage")
     node = mocker.Mock()
     node.configure_mock(**{"nodeid.Identifier": "monitornode1"})
-    value = mocker.sentinel.value
+    value = sentinel.value
     mocker.patch.object(opcua_client, "set_status")
     opcua_client.datachange_notification(node, value, mocker.Mock())
     set_status = cast(Mock, opcua_client.set_status)
     message_instance = data_change_message_mock.return_value
-    assert set_status.call_args_list == [mocker.call(LinkStatus.Up)]
-    assert data_change_message_mock.call_args_list == [
-        mocker.call(node_id="monitornode1", ua_object=value)
-    ]
+    set_status.assert_called_once_with(LinkStatus.Up)
+    data_change_message_mock.assert_called_once_with(
+        node_id="monitornode1", ua_object=value
+    )
     record_last_opc_data = cast(
         Mock, opcua_client._centrifugo_proxy_server.record_last_opc_data
     )
-    assert record_last_opc_data.call_args_list == [mocker.call(message_instance)]
+    record_last_opc_data.assert_called_once_with(message_instance)
     messaging_writer_put = cast(Mock, opcua_client._frontend_messaging_writer.put)
-    assert messaging_writer_put.call_args_list == [mocker.call(message_instance)]
+    messaging_writer_put.assert_called_once_with(message_instance)
     influx_writer_put = cast(Mock, opcua_client._influx_writer.put)
     influx_writer_put.assert_not_called()
 
@@ -399,7 +450,7 @@ def test_before_sleep(
     mocker.patch.object(opcua_client, "set_status")
     opcua_client.before_sleep(retry_call_state)
     set_status = cast(Mock, opcua_client.set_status)
-    assert set_status.call_args_list == [mocker.call(LinkStatus.Down)]
+    set_status.assert_called_once_with(LinkStatus.Down)
     last_log_record = log_records()[-1]
     assert last_log_record.levelno == logging.INFO
     assert "Retrying OPC client task" in last_log_record.message
@@ -407,29 +458,25 @@ def test_before_sleep(
     assert "ExceptionForTestingError: exception text" in last_log_record.message
 
 
-def test_task_wrapper(
-    event_loop: asyncio.AbstractEventLoop,
+async def test_task_wrapper(
     opcua_client: OPCUAClient,
     mocker: MockerFixture,
 ) -> None:
     mocker.patch.object(opcua_client, "_task")
-    async_retrying = mocker.patch(
-        "tenacity.AsyncRetrying", return_value=mocker.AsyncMock()
+    async_retrying = mocker.patch.object(
+        tenacity, "AsyncRetrying", return_value=mocker.AsyncMock()
     )
-    wait_fixed = mocker.patch("tenacity.wait_fixed")
-    retry_if_exception_type = mocker.patch("tenacity.retry_if_exception_type")
-    event_loop.run_until_complete(opcua_client.task())
-    assert async_retrying.call_args_list == [
-        mocker.call(
-            wait=wait_fixed.return_value,
-            retry=retry_if_exception_type.return_value.__or__.return_value,
-            before_sleep=opcua_client.before_sleep,
-        )
-    ]
-    assert wait_fixed.call_args_list == [mocker.call(1234)]
+    wait_fixed = mocker.patch.object(tenacity, "wait_fixed")
+    retry_if_exception_type = mocker.patch.object(tenacity, "retry_if_exception_type")
+    await opcua_client.task()
+    async_retrying.assert_called_once_with(
+        wait=wait_fixed.return_value,
+        retry=retry_if_exception_type.return_value.__or__.return_value,
+        before_sleep=opcua_client.before_sleep,
+    )
+    wait_fixed.assert_called_once_with(1234)
     assert retry_if_exception_type.call_args_list == [
         mocker.call(OSError),
         mocker.call(asyncio.TimeoutError),
     ]
-    call_method = cast(AsyncMock, async_retrying.return_value)
-    assert call_method.await_args_list == [mocker.call(opcua_client._task)]
+    async_retrying.return_value.assert_awaited_once_with(opcua_client._task)